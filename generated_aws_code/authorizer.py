@@ -1,91 +1,193 @@
 import base64
-import json
+import logging
 import os
-import boto3
-from ldap3 import Server, Connection, ALL, Tls
+import orjson
 import ssl
+from secrets_cache import get_secrets
 
 # Environment variables
 LDAP_SECRET_ARN = os.environ.get('LDAP_SECRET_ARN')
 AUTH_GROUP_DN = os.environ.get('AUTH_GROUP_DN') # e.g., 'CN=Underwriters,OU=Groups,DC=example,DC=com'
 
-# Boto3 client
-session = boto3.session.Session()
-secrets_client = session.client(service_name='secretsmanager')
+# Logging; set LOG_LEVEL=DEBUG to log full events
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-# Cached secret
-ldap_secret = None
+# ldap3 is imported on first use, so cold starts and requests denied before reaching LDAP never pay for it
+ldap3_module = None
+
+# TLS configuration and cached LDAP Server, reused across warm invocations
+ldap_tls = None
+ldap_server = None
+ldap_server_key = None
+
+# Pooled LDAP connections, kept open across warm invocations: one stays bound as the
+# service account for searches, the other is only rebound to verify user passwords.
+# They use the default SYNC strategy so a dead LDAP host fails fast; the handler reconnects
+# and retries once itself rather than relying on RESTARTABLE's sleep-and-retry loop.
+LDAP_RECEIVE_TIMEOUT = 5
+service_conn = None
+service_conn_key = None
+user_conn = None
+
+def get_ldap3():
+    """Imports ldap3 on first use and returns the cached module."""
+    global ldap3_module
+    if ldap3_module is None:
+        import ldap3
+        import ldap3.core.exceptions
+        import ldap3.utils.conv
+        ldap3_module = ldap3
+    return ldap3_module
 
 def get_ldap_secret():
-    """Fetches LDAP credentials from AWS Secrets Manager."""
-    global ldap_secret
-    if ldap_secret:
-        return ldap_secret
-    
+    """Fetches LDAP credentials from AWS Secrets Manager via the shared secret cache."""
+    return get_secrets([LDAP_SECRET_ARN])[LDAP_SECRET_ARN]
+
+def get_ldap_server(secret):
+    """Returns the cached LDAP Server, rebuilding it only if the connection settings in the secret change."""
+    global ldap_tls, ldap_server, ldap_server_key
+    ldap3 = get_ldap3()
+    ldap_host = secret['host']
+    ldap_port = int(secret.get('port', 389))
+    use_ssl = str(secret.get('use_ssl', 'false')).lower() == 'true'
+
+    key = (ldap_host, ldap_port, use_ssl)
+    if ldap_server is None or ldap_server_key != key:
+        # No rootDSE/schema read: the filters and DNs are literal strings, so server info is never used
+        server_options = {'host': ldap_host, 'port': ldap_port, 'get_info': ldap3.NONE, 'connect_timeout': 2}
+        if use_ssl:
+            if ldap_tls is None:
+                ldap_tls = ldap3.Tls(validate=ssl.CERT_REQUIRED, version=ssl.PROTOCOL_TLSv1_2)
+            server_options['use_ssl'] = True
+            server_options['tls'] = ldap_tls
+        ldap_server = ldap3.Server(**server_options)
+        ldap_server_key = key
+    return ldap_server
+
+def get_service_connection(secret):
+    """Returns the pooled service-account connection, binding a new one if it is missing, unbound or stale."""
+    global service_conn, service_conn_key
+    ldap3 = get_ldap3()
+    server = get_ldap_server(secret)
+    key = (server, secret['bind_dn'], secret['bind_password'])
+    if service_conn is None or service_conn_key != key or not service_conn.bound:
+        close_connection(service_conn)
+        service_conn = None
+        service_conn = ldap3.Connection(server, user=secret['bind_dn'], password=secret['bind_password'], auto_bind=True,
+                                        receive_timeout=LDAP_RECEIVE_TIMEOUT)
+        service_conn_key = key
+    return service_conn
+
+def get_user_connection(secret):
+    """Returns the pooled connection used for user binds; it is opened lazily by the first rebind."""
+    global user_conn
+    ldap3 = get_ldap3()
+    server = get_ldap_server(secret)
+    if user_conn is None or user_conn.server is not server:
+        close_connection(user_conn)
+        user_conn = ldap3.Connection(server, receive_timeout=LDAP_RECEIVE_TIMEOUT)
+    return user_conn
+
+def close_connection(conn):
+    """Unbinds a pooled connection, ignoring errors from sockets that are already dead."""
+    if conn is not None:
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+def reset_ldap_connections():
+    """Drops both pooled connections so the next request reconnects."""
+    global service_conn, user_conn
+    close_connection(service_conn)
+    close_connection(user_conn)
+    service_conn = None
+    user_conn = None
+
+def ldap_connection_errors():
+    """Returns the ldap3 exceptions raised when a pooled connection's socket is dead or unreachable."""
+    exceptions = get_ldap3().core.exceptions
+    return (exceptions.LDAPCommunicationError, exceptions.LDAPSocketOpenError, exceptions.LDAPSocketReceiveError,
+            exceptions.LDAPSessionTerminatedByServerError)
+
+def authenticate_user(secret, username, password):
+    """Returns the user's DN if they are in AUTH_GROUP_DN and their password binds, otherwise None."""
+    ldap3 = get_ldap3()
+    conn = get_service_connection(secret)
+
+    # Find the user's DN and check direct or nested group membership in a single search
+    escaped_username = ldap3.utils.conv.escape_filter_chars(username)
+    search_filter = (
+        f'(&(|(uid={escaped_username})(sAMAccountName={escaped_username}))'
+        f'(memberOf:1.2.840.113556.1.4.1941:={ldap3.utils.conv.escape_filter_chars(AUTH_GROUP_DN)}))'
+    )
+    conn.search(search_base=secret['base_dn'], search_filter=search_filter, attributes=ldap3.NO_ATTRIBUTES)
+
+    if not conn.entries:
+        logger.info("Authorization failed: User '%s' not found or not in group '%s'.", username, AUTH_GROUP_DN)
+        return None
+
+    user_dn = conn.entries[0].entry_dn
+
+    # Authenticate as the user on the pooled user connection, leaving the service connection bound
     try:
-        get_secret_value_response = secrets_client.get_secret_value(SecretId=LDAP_SECRET_ARN)
-        ldap_secret = json.loads(get_secret_value_response['SecretString'])
-        return ldap_secret
-    except Exception as e:
-        print(f"ERROR: Could not retrieve LDAP secret: {e}")
-        raise e
+        is_bound = get_user_connection(secret).rebind(user=user_dn, password=password)
+    except ldap3.core.exceptions.LDAPBindError as e:
+        # rebind reports a socket the server dropped as LDAPBindError; a wrong password returns False instead
+        raise ldap3.core.exceptions.LDAPSessionTerminatedByServerError(str(e)) from e
+    if not is_bound:
+        logger.info("Authentication failed for user DN: %s", user_dn)
+        return None
+    logger.info("Authentication successful for user DN: %s", user_dn)
+    return user_dn
+
+def parse_basic_auth(event):
+    """Returns (username, password) from a Basic Authorization header, or None if it is missing or malformed."""
+    auth_header = (event.get('headers') or {}).get('Authorization')
+    if not auth_header or not auth_header.lower().startswith('basic '):
+        return None
+    try:
+        raw_creds = base64.b64decode(auth_header[6:].strip(), validate=True)
+    except ValueError:
+        return None
+    # Split on the raw bytes so malformed input is rejected before anything is decoded
+    user_bytes, sep, pass_bytes = raw_creds.partition(b':')
+    if not sep or not user_bytes or not pass_bytes:
+        return None
+    try:
+        return user_bytes.decode('utf-8'), pass_bytes.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
 
 def handler(event, context):
     """Handles API Gateway authorizer request."""
-    print(f"Received event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received event: %s", orjson.dumps(event).decode())
     
+    credentials = parse_basic_auth(event)
+    if credentials is None:
+        logger.error("Missing or invalid Authorization header")
+        return generate_deny_policy(event['methodArn'])
+    username, password = credentials
+
     try:
         secret = get_ldap_secret()
-        ldap_host = secret['host']
-        ldap_port = int(secret.get('port', 389))
-        base_dn = secret['base_dn']
-        use_ssl = str(secret.get('use_ssl', 'false')).lower() == 'true'
-
-        auth_header = event.get('headers', {}).get('Authorization')
-        if not auth_header or not auth_header.lower().startswith('basic '):
-            print("ERROR: Missing or invalid Authorization header")
-            return generate_policy('user', 'Deny', event['methodArn'])
-
-        encoded_creds = auth_header.split(' ')[1]
-        decoded_creds = base64.b64decode(encoded_creds).decode('utf-8')
-        username, password = decoded_creds.split(':', 1)
-
-        # Find the user's DN
-        bind_dn = secret['bind_dn']
-        bind_password = secret['bind_password']
-        
-        server_options = {'host': ldap_host, 'port': ldap_port, 'get_info': ALL}
-        if use_ssl:
-            server_options['use_ssl'] = True
-            tls_config = Tls(validate=ssl.CERT_REQUIRED, version=ssl.PROTOCOL_TLSv1_2)
-            server_options['tls'] = tls_config
-            
-        server = Server(**server_options)
-
-        with Connection(server, user=bind_dn, password=bind_password, auto_bind=True) as conn:
-            search_filter = f'(|(uid={username})(sAMAccountName={username}))' 
-            conn.search(search_base=base_dn, search_filter=search_filter, attributes=['*'])
-            
-            if not conn.entries:
-                print(f"Authentication failed: User '{username}' not found.")
-                return generate_deny_policy(event['methodArn'])
-            
-            user_dn = conn.entries[0].entry_dn
-
-        # Authenticate as the user
-        with Connection(server, user=user_dn, password=password, auto_bind=True) as user_conn:
-            print(f"Authentication successful for user DN: {user_dn}")
-            # Authorize: Check group membership
-            # The search for group membership should be done with the bind user conexão, not the end user.
-            with Connection(server, user=bind_dn, password=bind_password, auto_bind=True) as admin_conn:
-                # This filter checks if the user is a direct or nested member of the group
-                is_member = admin_conn.search(AUTH_GROUP_DN, f'(member:1.2.840.113556.1.4.1941:={user_dn})', attributes=['cn'])
-                if not is_member or not admin_conn.entries:
-                    print(f"Authorization failed: User '{username}' is not in group '{AUTH_GROUP_DN}'.")
-                    return generate_deny_policy(event['methodArn'])
-
-        print(f"Authorization successful for user '{username}'.")
-        # Pass username and password to backend lambda for WS-Security
+
+        try:
+            user_dn = authenticate_user(secret, username, password)
+        except ldap_connection_errors() as e:
+            # A socket kept across a Lambda freeze may be dead on thaw; reconnect and retry once
+            logger.warning("LDAP connection failed, reconnecting: %s", e)
+            reset_ldap_connections()
+            user_dn = authenticate_user(secret, username, password)
+
+        if user_dn is None:
+            return generate_deny_policy(event['methodArn'])
+
+        logger.info("Authorization successful for user '%s'.", username)
+        # Pass username and password to backend lambda for WS-Security.
+        # The transformer sends the password as a PasswordText UsernameToken, so it cannot be replaced by a token here.
         authorizer_context = {
             "username": username,
             "password": password
@@ -93,7 +195,7 @@ def handler(event, context):
         return generate_allow_policy(username, event['methodArn'], authorizer_context)
 
     except Exception as e:
-        print(f"ERROR: An exception occurred in the authorizer: {e}")
+        logger.error("An exception occurred in the authorizer: %s", e)
         return generate_deny_policy(event['methodArn'])
 
 def generate_policy(principal_id, effect, resource, context=None):
@@ -119,3 +221,11 @@ def generate_allow_policy(principal_id, resource, context):
 
 def generate_deny_policy(resource):
     return generate_policy('user', 'Deny', resource)
+
+# Prefetch during the Lambda INIT phase so the first invocation reads from memory.
+# A failure here is not fatal; the handler retries the fetch on demand.
+if LDAP_SECRET_ARN:
+    try:
+        get_ldap_secret()
+    except Exception as e:
+        logger.warning("Could not prefetch LDAP secret during init: %s", e)
@@ -125,7 +125,8 @@ resource "aws_lambda_function" "transformer" {
 
   environment {
     variables = {
-      BACKEND_URL = var.backend_soap_url
+      BACKEND_URL           = var.backend_soap_url
+      BACKEND_GZIP_REQUESTS = tostring(var.backend_gzip_requests)
     }
   }
   tags = local.tags
@@ -1,5 +1,10 @@
 import re
 
+# Regex from DataPower: ^/underwriting/quote/([A-Za-z0-9\-]+)$
+# Compiled once per container; \Z rejects a trailing newline that $ would accept.
+QUOTE_PREFIX = '/underwriting/quote/'
+QUOTE_URI_RE = re.compile(r'^/underwriting/quote/([A-Za-z0-9\-]+)\Z')
+
 def handler(event, context):
     """
     Lambda@Edge function to replicate a DataPower URLRewritePolicy.
@@ -11,8 +16,8 @@ def handler(event, context):
     print(f"Handling request for URI: {uri}")
 
     # Match pattern: /underwriting/quote/{id}
-    # Regex from DataPower: ^/underwriting/quote/([A-Za-z0-9\-]+)$
-    match = re.match(r'^/underwriting/quote/([A-Za-z0-9\-]+)$', uri)
+    # The prefix check lets the common non-matching URIs skip the regex entirely.
+    match = QUOTE_URI_RE.match(uri) if uri.startswith(QUOTE_PREFIX) else None
 
     if match and request['method'] == 'POST':
         quote_id = match.group(1)
@@ -0,0 +1,65 @@
+import logging
+import os
+import time
+import orjson
+import botocore.session
+from botocore.config import Config
+
+# Environment variables
+SECRET_CACHE_TTL = int(os.environ.get('SECRET_CACHE_TTL', '300')) # seconds before a cached secret is refreshed
+SECRET_RETRY_INTERVAL = 30 # seconds to keep serving a stale secret after a failed refresh before trying again
+
+logger = logging.getLogger(__name__)
+
+# Botocore client, keeping the connection to Secrets Manager alive across warm invocations.
+# Built from a plain botocore session to skip boto3's session and resource loading at cold start.
+# Short timeouts keep an INIT-time prefetch inside Lambda's 10 s INIT limit and bound handler latency.
+session = botocore.session.get_session()
+secrets_client = session.create_client(
+    'secretsmanager',
+    config=Config(tcp_keepalive=True, connect_timeout=2, read_timeout=3, retries={'max_attempts': 2})
+)
+
+# Cached secrets: secret id -> (parsed secret, monotonic time it was fetched at)
+_secret_cache = {}
+
+def _fetch_secrets(names):
+    """Fetches secrets in one BatchGetSecretValue call, falling back to GetSecretValue for any the batch missed."""
+    fetched = {}
+    response = secrets_client.batch_get_secret_value(SecretIdList=names)
+    for secret_value in response.get('SecretValues', []):
+        # The batch response identifies secrets by ARN and name; key them by whichever was requested
+        for secret_id in (secret_value.get('ARN'), secret_value.get('Name')):
+            if secret_id in names:
+                fetched[secret_id] = orjson.loads(secret_value['SecretString'])
+
+    for name in names:
+        if name not in fetched:
+            get_secret_value_response = secrets_client.get_secret_value(SecretId=name)
+            fetched[name] = orjson.loads(get_secret_value_response['SecretString'])
+    return fetched
+
+def get_secrets(names):
+    """Returns a dict of secret id -> parsed JSON secret, cached for SECRET_CACHE_TTL seconds."""
+    now = time.monotonic()
+    stale = [name for name in names if name not in _secret_cache or now - _secret_cache[name][1] >= SECRET_CACHE_TTL]
+
+    if stale:
+        try:
+            fetched = _fetch_secrets(stale)
+        except Exception as e:
+            if all(name in _secret_cache for name in stale):
+                # Keep serving the stale values rather than failing every request during an outage,
+                # and back-date them so the next refresh is attempted after SECRET_RETRY_INTERVAL, not immediately
+                logger.warning("Could not refresh secrets, using cached values: %s", e)
+                retry_at = time.monotonic() - SECRET_CACHE_TTL + SECRET_RETRY_INTERVAL
+                for name in stale:
+                    _secret_cache[name] = (_secret_cache[name][0], retry_at)
+                return {name: _secret_cache[name][0] for name in names}
+            logger.error("Could not retrieve secrets: %s", e)
+            raise e
+        fetched_at = time.monotonic()
+        for name, value in fetched.items():
+            _secret_cache[name] = (value, fetched_at)
+
+    return {name: _secret_cache[name][0] for name in names}
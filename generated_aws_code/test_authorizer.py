@@ -0,0 +1,189 @@
+import base64
+import os
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import ldap3
+from ldap3.core.exceptions import LDAPBindError, LDAPSocketReceiveError
+import authorizer
+
+METHOD_ARN = 'arn:aws:execute-api:us-east-1:123456789012:api/v1/POST/v1/customer'
+SECRET = {'host': '127.0.0.1', 'port': 389, 'base_dn': 'DC=example,DC=com',
+          'bind_dn': 'CN=svc,DC=example,DC=com', 'bind_password': 'svc-password'}
+USER_DN = 'CN=alice,DC=example,DC=com'
+
+def make_event(credentials):
+    return {'methodArn': METHOD_ARN,
+            'headers': {'Authorization': 'Basic ' + base64.b64encode(credentials).decode()}}
+
+def policy_effect(policy):
+    return policy['policyDocument']['Statement'][0]['Effect']
+
+class FakeEntry:
+    entry_dn = USER_DN
+
+class FakeConnection:
+    """Stands in for ldap3.Connection; failures lists exceptions to raise, one per new connection."""
+    failures = []
+    created = 0
+
+    def __init__(self, server, user=None, password=None, auto_bind=False, **kwargs):
+        FakeConnection.created += 1
+        self.server = server
+        self.bound = bool(auto_bind)
+        self.entries = []
+        self.failure = FakeConnection.failures.pop(0) if FakeConnection.failures else None
+
+    def search(self, **kwargs):
+        if isinstance(self.failure, LDAPSocketReceiveError):
+            raise self.failure
+        self.entries = [FakeEntry()]
+        return True
+
+    def rebind(self, user=None, password=None):
+        if isinstance(self.failure, LDAPBindError):
+            raise self.failure
+        return password == 'alice-password'
+
+    def unbind(self):
+        self.bound = False
+
+class PooledConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        authorizer.reset_ldap_connections()
+        authorizer.ldap_server = None
+        FakeConnection.failures = []
+        FakeConnection.created = 0
+        patches = [
+            mock.patch.object(authorizer, 'get_ldap_secret', return_value=SECRET),
+            mock.patch.object(ldap3, 'Connection', FakeConnection),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_warm_invocations_reuse_pooled_connections(self):
+        for _ in range(3):
+            self.assertEqual(policy_effect(authorizer.handler(make_event(b'alice:alice-password'), None)), 'Allow')
+        self.assertEqual(FakeConnection.created, 2)
+
+    def test_wrong_password_is_denied(self):
+        self.assertEqual(policy_effect(authorizer.handler(make_event(b'alice:wrong'), None)), 'Deny')
+
+    def test_dead_service_socket_reconnects_and_retries(self):
+        FakeConnection.failures = [LDAPSocketReceiveError('connection reset by peer')]
+        self.assertEqual(policy_effect(authorizer.handler(make_event(b'alice:alice-password'), None)), 'Allow')
+
+    def test_dead_user_socket_reconnects_and_retries(self):
+        # Service connection is healthy; the user connection's socket was dropped while frozen
+        FakeConnection.failures = [None, LDAPBindError('server abruptly closed the connection')]
+        self.assertEqual(policy_effect(authorizer.handler(make_event(b'alice:alice-password'), None)), 'Allow')
+
+class MiniLDAPServer:
+    """Answers binds with success and searches with no entries; drop_connections() kills open sockets."""
+
+    def __init__(self):
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        self.accepted = 0
+        self.connections = []
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            self.connections.append(conn)
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        try:
+            while True:
+                header = conn.recv(2)
+                if len(header) < 2:
+                    return
+                length = header[1]
+                if length & 0x80:
+                    length = int.from_bytes(conn.recv(length & 0x7f), 'big')
+                message = b''
+                while len(message) < length:
+                    message += conn.recv(length - len(message))
+                # message = INTEGER messageID, then the protocol op
+                message_id = message[:2 + message[1]]
+                operation = message[2 + message[1]]
+                if operation == 0x60: # bindRequest -> bindResponse success
+                    op = bytes([0x61, 0x07, 0x0a, 0x01, 0x00, 0x04, 0x00, 0x04, 0x00])
+                elif operation == 0x63: # searchRequest -> searchResDone success, no entries
+                    op = bytes([0x65, 0x07, 0x0a, 0x01, 0x00, 0x04, 0x00, 0x04, 0x00])
+                else: # unbindRequest
+                    return
+                body = message_id + op
+                conn.sendall(bytes([0x30, len(body)]) + body)
+        except OSError:
+            return
+        finally:
+            conn.close()
+
+    def drop_connections(self):
+        for conn in self.connections:
+            conn.shutdown(socket.SHUT_RDWR)
+
+    def close(self):
+        self.listener.close()
+
+class DeadSocketTest(unittest.TestCase):
+
+    def setUp(self):
+        authorizer.reset_ldap_connections()
+        authorizer.ldap_server = None
+        self.server = MiniLDAPServer()
+        self.addCleanup(self.server.close)
+        patcher = mock.patch.object(authorizer, 'get_ldap_secret', return_value=dict(SECRET, port=self.server.port))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pooled_socket_dropped_between_invocations_is_reopened(self):
+        self.assertEqual(policy_effect(authorizer.handler(make_event(b'alice:alice-password'), None)), 'Deny')
+        self.assertEqual(self.server.accepted, 1)
+
+        # The pooled socket dies while the Lambda is frozen, e.g. an idle NAT timeout
+        self.server.drop_connections()
+        with self.assertLogs(level='WARNING') as logs:
+            started = time.monotonic()
+            self.assertEqual(policy_effect(authorizer.handler(make_event(b'alice:alice-password'), None)), 'Deny')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertIn('reconnecting', logs.output[0])
+        self.assertEqual(self.server.accepted, 2)
+
+class UnreachableServerTest(unittest.TestCase):
+
+    def setUp(self):
+        authorizer.reset_ldap_connections()
+        authorizer.ldap_server = None
+
+    def test_unreachable_ldap_server_denies_quickly(self):
+        # Grab a free port and close it so connections are refused
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        secret = dict(SECRET, port=port)
+
+        with mock.patch.object(authorizer, 'get_ldap_secret', return_value=secret):
+            started = time.monotonic()
+            policy = authorizer.handler(make_event(b'alice:alice-password'), None)
+        self.assertEqual(policy_effect(policy), 'Deny')
+        self.assertLess(time.monotonic() - started, 5)
+
+if __name__ == '__main__':
+    unittest.main()
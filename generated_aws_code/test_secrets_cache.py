@@ -0,0 +1,68 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import secrets_cache
+
+class FakeSecretsClient:
+    """Stands in for the Secrets Manager client; fail=True makes every call raise."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def batch_get_secret_value(self, SecretIdList):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError('Secrets Manager unavailable')
+        return {'SecretValues': [{'ARN': name, 'Name': name, 'SecretString': '{"value": 1}'} for name in SecretIdList]}
+
+class GetSecretsTest(unittest.TestCase):
+
+    def setUp(self):
+        secrets_cache._secret_cache.clear()
+        self.client = FakeSecretsClient()
+        self.now = 1000.0
+        patches = [
+            mock.patch.object(secrets_cache, 'secrets_client', self.client),
+            mock.patch.object(secrets_cache.time, 'monotonic', lambda: self.now),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_cached_until_ttl_expires(self):
+        secrets_cache.get_secrets(['ldap'])
+        self.now += secrets_cache.SECRET_CACHE_TTL - 1
+        secrets_cache.get_secrets(['ldap'])
+        self.assertEqual(self.client.calls, 1)
+        self.now += 1
+        secrets_cache.get_secrets(['ldap'])
+        self.assertEqual(self.client.calls, 2)
+
+    def test_failed_refresh_serves_stale_value_and_backs_off(self):
+        secrets_cache.get_secrets(['ldap'])
+        self.client.fail = True
+        self.now += secrets_cache.SECRET_CACHE_TTL
+
+        self.assertEqual(secrets_cache.get_secrets(['ldap']), {'ldap': {'value': 1}})
+        self.assertEqual(self.client.calls, 2)
+
+        # Further calls within the retry interval do not hit Secrets Manager again
+        self.now += secrets_cache.SECRET_RETRY_INTERVAL - 1
+        secrets_cache.get_secrets(['ldap'])
+        self.assertEqual(self.client.calls, 2)
+
+        self.now += 1
+        secrets_cache.get_secrets(['ldap'])
+        self.assertEqual(self.client.calls, 3)
+
+    def test_failure_without_cached_value_raises(self):
+        self.client.fail = True
+        with self.assertRaises(ConnectionError):
+            secrets_cache.get_secrets(['ldap'])
+
+if __name__ == '__main__':
+    unittest.main()
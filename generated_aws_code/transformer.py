@@ -1,10 +1,82 @@
-import json
+import gzip
+import logging
 import os
+import re
+import socket
+from string import Template
+from urllib.parse import urlsplit, urlunsplit
+from xml.sax.saxutils import escape
+import orjson
 import requests
-import xml.etree.ElementTree as ET
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree as ET
 
 # Environment variables
 BACKEND_URL = os.environ.get('BACKEND_URL', 'https://backend.example.com/soap/UnderwritingService')
+BACKEND_GZIP_REQUESTS = os.environ.get('BACKEND_GZIP_REQUESTS', 'false').lower() == 'true' # only if the backend accepts Content-Encoding: gzip
+GZIP_MIN_BYTES = 512 # smaller payloads are not worth compressing
+
+# Logging; set LOG_LEVEL=DEBUG to log full events and SOAP requests
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# --- Backend Connection ---
+
+BACKEND_URL_PARTS = urlsplit(BACKEND_URL)
+BACKEND_HOST = BACKEND_URL_PARTS.hostname
+BACKEND_HOST_HEADER = BACKEND_HOST if BACKEND_URL_PARTS.port is None else f'{BACKEND_HOST}:{BACKEND_URL_PARTS.port}'
+
+class PinnedHostAdapter(HTTPAdapter):
+    """HTTPS adapter for requests sent to a resolved IP; TLS SNI and certificate checks still use the hostname."""
+
+    def __init__(self, hostname, **kwargs):
+        self.hostname = hostname
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['server_hostname'] = self.hostname
+        kwargs['assert_hostname'] = self.hostname
+        super().init_poolmanager(*args, **kwargs)
+
+# Shared HTTP session. Lambda freezes the process between invocations, so the pooled
+# keep-alive connection to the backend is reused on warm starts instead of a new TLS handshake.
+# The session only ever talks to the backend, so the HTTPS adapter can be pinned to its hostname.
+SESSION = requests.Session()
+_adapter_options = {'pool_connections': 4, 'pool_maxsize': 10, 'max_retries': Retry(total=2, backoff_factor=0.1)}
+SESSION.mount('https://', PinnedHostAdapter(BACKEND_HOST, **_adapter_options))
+SESSION.mount('http://', HTTPAdapter(**_adapter_options))
+
+# BACKEND_URL with the host replaced by its IP, resolved once per container instead of on every new connection
+backend_request_url = BACKEND_URL
+
+def resolve_backend_url():
+    """Re-resolves the backend host and returns True if the pinned URL changed."""
+    global backend_request_url
+    try:
+        ip = socket.gethostbyname(BACKEND_HOST)
+    except OSError as e:
+        logger.warning("Could not resolve backend host %s, using the hostname: %s", BACKEND_HOST, e)
+        ip = BACKEND_HOST
+    netloc = ip if BACKEND_URL_PARTS.port is None else f'{ip}:{BACKEND_URL_PARTS.port}'
+    new_url = urlunsplit(BACKEND_URL_PARTS._replace(netloc=netloc))
+    changed = new_url != backend_request_url
+    backend_request_url = new_url
+    return changed
+
+def post_to_backend(data, headers):
+    """POSTs to the pinned backend IP, re-resolving once if the connection fails because the IP moved."""
+    headers = {**headers, 'Host': BACKEND_HOST_HEADER}
+    try:
+        return SESSION.post(backend_request_url, data=data, headers=headers, timeout=10)
+    except requests.exceptions.ConnectionError:
+        # Only retry when DNS now points elsewhere, so a POST the old host may have processed is not resent
+        if not resolve_backend_url():
+            raise
+        logger.warning("Backend host %s moved to a new address, retrying", BACKEND_HOST)
+        return SESSION.post(backend_request_url, data=data, headers=headers, timeout=10)
+
+resolve_backend_url()
 
 # --- XML/SOAP Helper Functions ---
 
@@ -12,48 +84,140 @@ SOAP_ENV_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
 WSSE_NS = 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd'
 WSU_NS = 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd'
 
-ET.register_namespace('soap', SOAP_ENV_NS)
-ET.register_namespace('wsse', WSSE_NS)
-ET.register_namespace('wsu', WSU_NS)
+SOAP_NSMAP = {'soap': SOAP_ENV_NS}
+WSSE_NSMAP = {'wsse': WSSE_NS, 'wsu': WSU_NS}
+PASSWORD_TEXT_TYPE = 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-username-token-profile-1.0#PasswordText'
+
+# Envelope skeleton compiled once at import; only the escaped user fields are spliced in per request.
+# Once encoded, renders byte-for-byte what create_soap_envelope(..., build_wsse_header(...)) serializes.
+SOAP_ENVELOPE_TEMPLATE = Template(
+    "<?xml version='1.0' encoding='utf-8'?>\n"
+    '<soap:Envelope xmlns:soap="' + SOAP_ENV_NS + '">'
+    '<soap:Header>'
+    '<wsse:Security xmlns:wsse="' + WSSE_NS + '" xmlns:wsu="' + WSU_NS + '">'
+    '<wsse:UsernameToken wsu:Id="UsernameToken-1">'
+    '<wsse:Username>${WSSE_USER}</wsse:Username>'
+    '<wsse:Password Type="' + PASSWORD_TEXT_TYPE + '">${WSSE_PASS}</wsse:Password>'
+    '</wsse:UsernameToken>'
+    '</wsse:Security>'
+    '</soap:Header>'
+    '<soap:Body>${BODY_XML}</soap:Body>'
+    '</soap:Envelope>'
+)
+
+# Keys the string path can emit as element names without further checks, and characters XML 1.0 forbids
+XML_NAME_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_.\-]*\Z')
+XML_TEXT_ENTITIES = {'\r': '&#13;'} # as lxml escapes it, so the carriage return survives parsing
+INVALID_XML_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+class TemplateUnsupported(Exception):
+    """Raised when a payload must go through the lxml DOM path instead of the string template."""
 
 def build_wsse_header(username, password):
-    """Builds the WS-Security UsernameToken header safely using ElementTree."""
-    security_header = ET.Element(f'{{{WSSE_NS}}}Security')
+    """Builds the WS-Security UsernameToken header safely using lxml."""
+    security_header = ET.Element(f'{{{WSSE_NS}}}Security', nsmap=WSSE_NSMAP)
     token = ET.SubElement(security_header, f'{{{WSSE_NS}}}UsernameToken', {f'{{{WSU_NS}}}Id': 'UsernameToken-1'})
     user_el = ET.SubElement(token, f'{{{WSSE_NS}}}Username')
     user_el.text = username
-    pass_el = ET.SubElement(token, f'{{{WSSE_NS}}}Password', {'Type': 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-username-token-profile-1.0#PasswordText'})
+    pass_el = ET.SubElement(token, f'{{{WSSE_NS}}}Password', {'Type': PASSWORD_TEXT_TYPE})
     pass_el.text = password
     return security_header
 
 def create_soap_envelope(body_content, wsse_header=None):
-    """Creates a complete SOAP envelope."""
-    envelope = ET.Element(f'{{{SOAP_ENV_NS}}}Envelope')
+    """Creates a complete SOAP envelope, serialized straight to UTF-8 bytes with its XML declaration."""
+    envelope = ET.Element(f'{{{SOAP_ENV_NS}}}Envelope', nsmap=SOAP_NSMAP)
     header = ET.SubElement(envelope, f'{{{SOAP_ENV_NS}}}Header')
     if wsse_header is not None:
         header.append(wsse_header)
     body = ET.SubElement(envelope, f'{{{SOAP_ENV_NS}}}Body')
     body.append(body_content)
-    return ET.tostring(envelope, encoding='unicode')
+    return ET.tostring(envelope, encoding='utf-8', xml_declaration=True)
 
 def json_to_xml_elements(parent_element, json_data):
-    """Recursively converts a dictionary to XML elements."""
-    if isinstance(json_data, dict):
-        for key, value in json_data.items():
-            child = ET.SubElement(parent_element, key)
-            json_to_xml_elements(child, value)
-    elif isinstance(json_data, list):
-        for item in json_data:
-            # Assuming list contains dicts, might need more complex logic
-            json_to_xml_elements(parent_element, item)
-    else:
-        parent_element.text = str(json_data)
+    """Converts a dictionary to XML elements, iterating over an explicit stack instead of recursing."""
+    sub_element = ET.SubElement
+    stack = [(parent_element, json_data)]
+    while stack:
+        parent_element, json_data = stack.pop()
+        if isinstance(json_data, dict):
+            for key, value in json_data.items():
+                stack.append((sub_element(parent_element, key), value))
+        elif isinstance(json_data, list):
+            # Assuming list contains dicts, might need more complex logic.
+            # Pushed in reverse so items are applied in document order.
+            stack.extend((parent_element, item) for item in reversed(json_data))
+        else:
+            parent_element.text = str(json_data)
+
+def build_soap_body(operation_name, wrappers, body):
+    """Builds the SOAP body content with lxml; wrappers is a sequence of (element name, JSON key) pairs."""
+    soap_body_content = ET.Element(operation_name)
+    for element_name, json_key in wrappers:
+        json_to_xml_elements(ET.SubElement(soap_body_content, element_name), body.get(json_key))
+    return soap_body_content
+
+def escape_text(value):
+    """XML-escapes a text value, rejecting characters that only the DOM path can report on."""
+    text = str(value)
+    if INVALID_XML_CHARS_RE.search(text):
+        raise TemplateUnsupported('text contains characters not allowed in XML')
+    return escape(text, XML_TEXT_ENTITIES)
+
+def json_to_xml_str(parts, tag, json_data):
+    """Appends <tag>...</tag> for json_data to parts, mirroring json_to_xml_elements without recursion."""
+    append = parts.append
+    # Entries are (tag, data, None) to open an element or (tag, None, start) to close the one opened at parts[start]
+    stack = [(tag, json_data, None)]
+    while stack:
+        tag, json_data, start = stack.pop()
+        if start is not None:
+            if len(parts) == start + 1:
+                parts[start] = f'<{tag}/>'
+            else:
+                append(f'</{tag}>')
+            continue
+
+        if not XML_NAME_RE.match(tag):
+            raise TemplateUnsupported(f'{tag!r} needs validation as an element name')
+        stack.append((tag, None, len(parts)))
+        append(f'<{tag}>')
+        if isinstance(json_data, dict):
+            stack.extend((key, value, None) for key, value in reversed(json_data.items()))
+        elif isinstance(json_data, list):
+            # The DOM path merges list items into the parent; only lists of dicts serialize the same way
+            children = []
+            for item in json_data:
+                if not isinstance(item, dict):
+                    raise TemplateUnsupported('list items other than objects')
+                children.extend(item.items())
+            stack.extend((key, value, None) for key, value in reversed(children))
+        else:
+            append(escape_text(json_data))
+
+def render_soap_envelope(operation_name, wrappers, body, username, password):
+    """Renders the full SOAP envelope as UTF-8 bytes from the precompiled template without building a DOM."""
+    parts = [f'<{operation_name}>']
+    for element_name, json_key in wrappers:
+        json_to_xml_str(parts, element_name, body.get(json_key))
+    parts.append(f'</{operation_name}>')
+    return SOAP_ENVELOPE_TEMPLATE.substitute(
+        WSSE_USER=escape_text(username),
+        WSSE_PASS=escape_text(password),
+        BODY_XML=''.join(parts)
+    ).encode('utf-8')
 
 # --- Main Handler ---
 
+# Request path -> (SOAP operation, (wrapper element, JSON key) pairs), per the XSLT
+SOAP_OPERATIONS = {
+    '/v1/customer': ('SaveCustomerInfo', (('Customer', 'customer'), ('Address', 'address'), ('Demographics', 'demographics'), ('Employment', 'employment'))),
+    '/v1/underwriting/submit': ('SubmitApplication', (('Applicant', 'customer'), ('Address', 'address'), ('Demographics', 'demographics'), ('Employment', 'employment'))),
+}
+
 def handler(event, context):
     """Handles the API Gateway request, transforms JSON to SOAP, and calls the backend."""
-    print(f"Received event: {json.dumps(event)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received event: %s", orjson.dumps(event).decode())
 
     try:
         # 1. Get identity from authorizer context
@@ -65,46 +229,42 @@ def handler(event, context):
 
         # 2. Get incoming JSON body and path
         try:
-            body = json.loads(event.get('body', '{}'))
-        except json.JSONDecodeError:
+            body = orjson.loads(event.get('body') or '{}')
+        except orjson.JSONDecodeError:
             return {'statusCode': 400, 'body': 'Invalid JSON in request body.'}
         
         path = event.get('path', '')
 
         # 3. Determine SOAP operation based on path (replicating XSLT logic)
-        if path == '/v1/customer':
-            operation_name = 'SaveCustomerInfo'
-            # Wrapper elements per XSLT
-            soap_body_content = ET.Element(operation_name)
-            json_to_xml_elements(ET.SubElement(soap_body_content, 'Customer'), body.get('customer'))
-            json_to_xml_elements(ET.SubElement(soap_body_content, 'Address'), body.get('address'))
-            json_to_xml_elements(ET.SubElement(soap_body_content, 'Demographics'), body.get('demographics'))
-            json_to_xml_elements(ET.SubElement(soap_body_content, 'Employment'), body.get('employment'))
-        elif path == '/v1/underwriting/submit':
-            operation_name = 'SubmitApplication'
-            # Wrapper elements per XSLT
-            soap_body_content = ET.Element(operation_name)
-            json_to_xml_elements(ET.SubElement(soap_body_content, 'Applicant'), body.get('customer'))
-            json_to_xml_elements(ET.SubElement(soap_body_content, 'Address'), body.get('address'))
-            json_to_xml_elements(ET.SubElement(soap_body_content, 'Demographics'), body.get('demographics'))
-            json_to_xml_elements(ET.SubElement(soap_body_content, 'Employment'), body.get('employment'))
-        else:
+        try:
+            operation_name, wrappers = SOAP_OPERATIONS[path]
+        except KeyError:
             return {'statusCode': 404, 'body': f'Endpoint {path} not found.'}
 
-        # 4. Build WS-Security header
-        wsse_header = build_wsse_header(username, password)
+        # 4. Construct the full SOAP envelope with the WS-Security header
+        try:
+            soap_request = render_soap_envelope(operation_name, wrappers, body, username, password)
+        except TemplateUnsupported:
+            # Keys or values that need validation go through lxml, which rejects anything unsafe
+            soap_body_content = build_soap_body(operation_name, wrappers, body)
+            wsse_header = build_wsse_header(username, password)
+            soap_request = create_soap_envelope(soap_body_content, wsse_header)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Constructed SOAP Request: %s", soap_request.decode('utf-8'))
 
-        # 5. Construct the full SOAP envelope
-        soap_request = create_soap_envelope(soap_body_content, wsse_header)
-        print(f"Constructed SOAP Request: {soap_request}")
+        # 5. Call the backend SOAP service
+        headers = {'Content-Type': 'text/xml; charset=utf-8', 'Connection': 'keep-alive'}
+        request_body = soap_request
+        if BACKEND_GZIP_REQUESTS and len(request_body) > GZIP_MIN_BYTES:
+            # Fastest level: SOAP envelopes are repetitive enough that it still removes most of the bytes
+            request_body = gzip.compress(request_body, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
 
-        # 6. Call the backend SOAP service
-        headers = {'Content-Type': 'text/xml; charset=utf-8'}
-        
-        response = requests.post(BACKEND_URL, data=soap_request.encode('utf-8'), headers=headers, timeout=10)
+        # requests advertises Accept-Encoding: gzip and decompresses the response transparently
+        response = post_to_backend(request_body, headers)
         response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
 
-        # 7. Return backend response to the caller
+        # 6. Return backend response to the caller
         return {
             'statusCode': response.status_code,
             'headers': {'Content-Type': 'application/xml'},
@@ -112,8 +272,8 @@ def handler(event, context):
         }
 
     except requests.exceptions.RequestException as e:
-        print(f"ERROR: Backend request failed: {e}")
+        logger.error("Backend request failed: %s", e)
         return {'statusCode': 502, 'body': f'Bad Gateway: Could not connect to backend service. {e}'}
     except Exception as e:
-        print(f"ERROR: An unexpected error occurred: {e}")
+        logger.error("An unexpected error occurred: %s", e)
         return {'statusCode': 500, 'body': f'Internal Server Error: {e}'}
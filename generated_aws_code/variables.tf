@@ -16,6 +16,12 @@ variable "backend_soap_url" {
   default     = "https://backend.example.com/soap/UnderwritingService"
 }
 
+variable "backend_gzip_requests" {
+  description = "Whether to gzip SOAP request bodies sent to the backend. Enable only if the backend accepts Content-Encoding: gzip."
+  type        = bool
+  default     = false
+}
+
 variable "ldap_server_host" {
   description = "Hostname of the LDAP server."
   type        = string